@@ -29,71 +29,290 @@
 ###############################################################################
 
 
-import time                         # for sleeping
+import concurrent.futures           # for replies that are read in the background
+import pprint                       # for debug output
+import queue                        # for the replies that are still expected
+import struct                       # for packing the packet prefix
+import sys                          # for platform specific port settings
+import threading                    # for the background reader
+import time                         # for polling the status
 import serial                       # for RS232 connection
 
 
+# returned instead of a reply when the packet could not be written completely. it is not
+# empty, so it is not mistaken for no reply, and it fails the header check of every command
+_WRITE_FAILED = b'\x00'
+
+# complete packets of the commands that never carry variable data
+_CMD_REMOTE_ON      = bytes((0x7E, 0x07, 0x05, 0x47, 0x10, 0x03, 0xFF))          # 6.2
+_CMD_REMOTE_OFF     = bytes((0x7E, 0x07, 0x05, 0x47, 0x10, 0x04, 0xFF))          # 6.2
+_CMD_PLAY           = bytes((0x7E, 0x07, 0x05, 0x47, 0x02, 0x01, 0xFF))          # 6.4
+_CMD_STOP           = bytes((0x7E, 0x07, 0x05, 0x47, 0x02, 0x02, 0xFF))          # 6.5
+_CMD_REC            = bytes((0x7E, 0x07, 0x05, 0x47, 0x02, 0x21, 0xFF))          # 6.13
+_CMD_EJECT          = bytes((0x7E, 0x07, 0x05, 0x47, 0x02, 0x40, 0xFF))          # 6.15
+_CMD_MODEL          = bytes((0x7E, 0x07, 0x05, 0x47, 0x20, 0x10, 0xFF))          # 6.29
+_CMD_STATUS         = bytes((0x7E, 0x07, 0x05, 0x47, 0x20, 0x20, 0xFF))          # 6.30
+_CMD_DISC_DATA      = bytes((0x7E, 0x07, 0x05, 0x47, 0x20, 0x21, 0xFF))          # 6.31
+_CMD_MODEL_NAME     = bytes((0x7E, 0x07, 0x05, 0x47, 0x20, 0x22, 0xFF))          # 6.32
+_CMD_TOC_DATA       = bytes((0x7E, 0x08, 0x05, 0x47, 0x20, 0x44, 0x01, 0xFF))    # 6.34
+_CMD_DISC_NAME      = bytes((0x7E, 0x08, 0x05, 0x47, 0x20, 0x48, 0x01, 0xFF))    # 6.36
+_CMD_REC_REMAIN     = bytes((0x7E, 0x08, 0x05, 0x47, 0x20, 0x54, 0x01, 0xFF))    # 6.40
+
+
 class MDS:
 
+    # fixed part of every packet: header, length, format type, category, byte 5 and byte 6
+    _PREFIX = struct.Struct('<BBBBBB')
+
+    # packets that have been built before, keyed by (b5, b6, data)
+    _FRAME_CACHE = {}
+
+    # serialports that are kept open between sessions, keyed by port name
+    _PORT_CACHE = {}
+
+    # operation mode, the lower nibble of status byte 6
+    _MODE_MAP = {
+        0b0000 : 'STOP',
+        0b0001 : 'PLAY',
+        0b0010 : 'PAUSE',
+        0b0011 : 'EJECT',
+        0b0100 : 'REC PLAY',
+        0b0101 : 'REC PAUSE',
+        0b0110 : 'rehearsal',
+        0b1111 : 'not available to play',
+        }
+
+    # selected input, the lower 3 bits of status byte 8
+    _INPUT_MAP = {
+        0b001 : 'analog',
+        0b011 : 'optical',
+        0b101 : 'coaxial',
+        }
+
     def __init__(self, serialport):
         '''Init of the MDS. We need to parse the serialport location that we are going to use.'''
         self.serialport = serialport
+        # replies still expected for commands that were sent via process_command_async
+        self._replies = queue.Queue()
+        self._reader = None
+        self._write_lock = threading.Lock()
+        # bytes received from the MDS that have not been handed out as a packet yet
+        self._rx = bytearray()
+        # locally kept estimate of the rec remain time in seconds, see rec_remain_cached
+        self._rec_remain = None
 
-    def serial_open(self):
-        '''Open the serialport that we parsed at the init.'''
-        self.ser = serial.Serial(
-            port        = self.serialport,
-            baudrate    = 9600,
-            parity      = serial.PARITY_NONE,
-            stopbits    = serial.STOPBITS_ONE,
-            bytesize    = serial.EIGHTBITS,
-            timeout     = 2
-            )
+    def serial_open(self, reopen_on_failure = True):
+        '''Open the serialport that we parsed at the init. A port that is still open from an earlier
+        session in this process is reused, unless it went stale and reopen_on_failure is set.'''
+        ser = self._PORT_CACHE.get(self.serialport)
+        if ser is not None and ser.is_open:
+            try:
+                # fails when the handle went stale, for example after the USB adapter was replugged.
+                # Windows reports this as a SerialException, POSIX as an OSError
+                ser.in_waiting
+            except (serial.SerialException, OSError):
+                if not reopen_on_failure:
+                    raise
+                try:
+                    ser.close()
+                except (serial.SerialException, OSError):
+                    pass
+                ser = None
+        if ser is None or not ser.is_open:
+            # no DTR/RTS handshaking, the cable is a plain cross cable
+            ser = serial.Serial(
+                port        = self.serialport,
+                baudrate    = 9600,
+                parity      = serial.PARITY_NONE,
+                stopbits    = serial.STOPBITS_ONE,
+                bytesize    = serial.EIGHTBITS,
+                timeout     = 2,
+                dsrdtr      = False,
+                rtscts      = False
+                )
+            self._PORT_CACHE[self.serialport] = ser
+        self.ser = ser
+        # a new session, the disc may have been changed
+        self._rec_remain = None
         return self.ser.is_open
 
-    def serial_close(self):
-        '''Close the serialport that we parsed at the init.'''
+    def enable_low_latency(self):
+        '''Ask the serial driver to hand over received bytes right away instead of collecting them
+        first. Only possible on Linux, where the ASYNC_LOW_LATENCY flag of the port is set.
+        Returns 0 when set and -1 when the platform or the driver does not support it.'''
+        if not sys.platform.startswith('linux'):
+            # on Windows the latency timer of USB adapters is a driver setting in the registry
+            return -1
+        try:
+            self.ser.set_low_latency_mode(True)
+        except (AttributeError, NotImplementedError, ValueError):
+            return -1
+        return 0
+
+    def serial_close(self, final = False):
+        '''Release the serialport that we parsed at the init. The port is kept open for the next
+        session, opening it again can reset the USB adapter. Only with final the port is closed.
+        Returns True when the port could not be closed.'''
+        self.ser.flush()
+        if not final:
+            return False
+        self._PORT_CACHE.pop(self.serialport, None)
         self.ser.close()
         return self.ser.is_open
 
-    def process_command(self, b5, b6, data, debug = False, sleep=0.5):
-        """Handle byte commands with the MDS. This method will only do a basic inspection of the data that comes back."""
-        # add the terminator at the end
-        data.append(0xFF)
-        # add byte 6, then 5, then category, then format type at the front
-        data.insert(0,b6)
-        data.insert(0,b5)
-        data.insert(0,0x47)
-        data.insert(0,0x05)
-        # now insert the amount of bytes in the packet at the front
-        data.insert(0,len(data)+2)
-        # add the header at the front
-        data.insert(0,0x7E)
-        # transform the list into a byte array so we can push it out of the RS232 port
-        transmit = bytearray(data)
+    def _frame(self, b5, b6, data = b''):
+        """Build the packet for a command. Packets that have been built before come from the cache."""
+        key = (b5, b6, bytes(data))
+        transmit = self._FRAME_CACHE.get(key)
+        if transmit is None:
+            # lay down the packet left to right: prefix, data, terminator
+            # the packet length counts the prefix, the data and the terminator
+            transmit = self._PREFIX.pack(0x7E, len(data)+7, 0x05, 0x47, b5, b6) + key[2] + b'\xFF'
+            self._FRAME_CACHE[key] = transmit
+        return transmit
+
+    def process_command(self, b5, b6, data: bytes = b'', debug = False):
+        """Handle byte commands with the MDS. This method will only do a basic inspection of the data that comes back.
+        The reply packet is returned as bytes, empty when the MDS did not respond and
+        _WRITE_FAILED when the command could not be sent."""
+        return self._send_raw(self._frame(b5, b6, data), debug)
+
+    def _send_raw(self, transmit, debug = False, reader = None):
+        """Send a complete packet to the MDS and read back the packet it responds with."""
         # write to the RS232 port
         if debug:
             print('Transmitting:', list(transmit))
+        # the replies of commands sent in the background need to be in first
+        self._replies.join()
+        # throw away anything left over from an earlier command
+        self.ser.reset_input_buffer()
+        self._rx.clear()
         trbytes = self.ser.write(transmit)
         if trbytes != len(transmit):
-            return [-1]
-        # small delay to give the MDS time to respond. keep in mind, it is slow.
-        time.sleep(sleep)
-        # check how many bytes are in the buffer    
-        exp =  int(self.ser.in_waiting )
-        if exp == 0:
-            return [-2]
+            return _WRITE_FAILED
+        # the MDS is slow, but the packet tells us how long it is, so read exactly one packet
+        receive = (reader or self._read_packet)()
         if debug:
-            print('received bytes: ', exp)
-        # prepare a receive array with length of exp, the amount of bytes in the buffer
-        receive = bytearray( exp )
-        # read the bytes into the buffer and return
-        self.ser.readinto(receive)
-        return list(receive)
+            print('received bytes: ', len(receive))
+        return receive
+
+    def process_command_async(self, b5, b6, data: bytes = b'', reader = None, parse = None):
+        """Send a command to the MDS without waiting for the reply. A Future is returned that
+        resolves to the reply, optionally passed through parse. The MDS handles the commands
+        one by one, so a single reader thread resolves the replies in the order they were sent."""
+        future = concurrent.futures.Future()
+        transmit = self._frame(b5, b6, data)
+        with self._write_lock:
+            if self._reader is None:
+                self._reader = threading.Thread(target=self._reader_loop, daemon=True)
+                self._reader.start()
+            # with no reply outstanding, anything received so far is left over from an earlier
+            # command. throw it away, the same as for a command that waits for its reply
+            if self._replies.unfinished_tasks == 0:
+                self.ser.reset_input_buffer()
+                self._rx.clear()
+            trbytes = self.ser.write(transmit)
+            if trbytes != len(transmit):
+                future.set_result(parse(_WRITE_FAILED) if parse else _WRITE_FAILED)
+                return future
+            self._replies.put((future, reader or self._read_packet, parse))
+        return future
+
+    def _reader_loop(self):
+        """Background reader, owns the reading side of the serialport while replies are expected."""
+        while True:
+            future, reader, parse = self._replies.get()
+            try:
+                receive = reader()
+                future.set_result(parse(receive) if parse else receive)
+            except Exception as error:
+                future.set_exception(error)
+            finally:
+                self._replies.task_done()
+
+    def _drain_response(self, needed):
+        """Move the bytes received from the MDS into the receive buffer. A single read takes at least
+        the bytes that are still needed and everything else the driver already has waiting.
+        Returns False when nothing came in before the timeout."""
+        received = self.ser.read(max(needed, self.ser.in_waiting))
+        self._rx += received
+        return len(received) > 0
+
+    def _read_packet(self):
+        """Read a single packet from the MDS. Byte 2 of the packet holds the packet length.
+        Empty bytes mean that nothing was received."""
+        rx = self._rx
+        while True:
+            while len(rx) < 2:
+                if not self._drain_response(2 - len(rx)):
+                    rx.clear()
+                    return b''
+            if rx[0] == 0x6F and 7 <= rx[1] <= 32:
+                length = rx[1]
+                while len(rx) < length and self._drain_response(length - len(rx)):
+                    pass
+                packet = bytes(rx[:length])
+                del rx[:length]
+                return packet
+            # this is not the start of a packet. skip up to the next terminator
+            # so that we are at a packet boundary again and try again
+            end = rx.find(0xFF)
+            if end >= 0:
+                del rx[:end+1]
+            else:
+                rx.clear()
+                if not self.ser.read_until(b'\xFF', 64).endswith(b'\xFF'):
+                    return b''
+
+    def _read_name_packets(self, receive, opcode):
+        """A name can span several packets. Keep reading until the 0x00 that ends the name shows up.
+        opcode is the one the MDS uses for the packets that continue the name."""
+        packet = receive
+        while 0x00 not in packet[7:-1]:
+            packet = self._read_packet()
+            if len(packet) == 0:
+                break
+            # the name may end exactly on a packet boundary without a 0x00. then this packet
+            # is the reply to the next command, leave it for whoever is waiting on that one
+            if len(packet) < 8 or packet[4] != 0x20 or packet[5] != opcode:
+                self._rx[:0] = packet
+                break
+            receive += packet
+        return receive
+
+    def _read_acks(self, count):
+        """Read up to count reply packets. Stop at the first timeout, the rest will not show up either."""
+        replies = []
+        for _ in range(count):
+            packet = self._read_packet()
+            if len(packet) == 0:
+                break
+            replies.append(packet)
+        return replies
+
+    def _extract_name(self, receive, opcode) -> str:
+        """Collect the name text out of one or more name packets in a single pass."""
+        parts = []
+        i = 0
+        while i < len(receive) and receive[i] == 0x6F:
+            pkt_len = receive[i+1]
+            if pkt_len < 8:
+                break
+            # the name text sits between byte 7 and the terminator
+            payload = receive[i+7:i+pkt_len-1]
+            if opcode == 0x4A:
+                # as soon as we see the 0x00 it is the end of the track name
+                payload = payload.split(b'\x00', 1)[0]
+            else:
+                payload = payload.replace(b'\x00', b'')
+            parts.append(payload.decode('latin-1'))
+            # move to the next packet
+            i += pkt_len
+        return ''.join(parts)
 
     def remote_on(self): # 6.2 / 7.2
         """Enable the remote mode of the MDS"""
-        receive = self.process_command(0x10, 0x03, [])
+        receive = self._send_raw(_CMD_REMOTE_ON)
         # we can expect a status message ?? --> to be double checked
         # print('remote_on', receive)
         if len(receive) == 0:
@@ -112,7 +331,7 @@ class MDS:
 
     def remote_off(self): # 6.2
         """Enable the remote mode of the MDS"""
-        receive = self.process_command(0x10, 0x04, [])
+        receive = self._send_raw(_CMD_REMOTE_OFF)
         # print('remote_off', receive)
         if len(receive) == 0:
             return -1
@@ -130,7 +349,7 @@ class MDS:
 
     def model_request(self): # 6.29
         """Verify the model data against a fixed response. This is probably fixed for the E12."""
-        receive = self.process_command(0x20, 0x10)
+        receive = self._send_raw(_CMD_MODEL)
         # print('model_request', receive)
         if len(receive) == 0:
             return -1
@@ -150,8 +369,7 @@ class MDS:
 
     def model_name_req(self): # 6.32
         """Ask the MDS for the model name."""
-        name = ''
-        receive = self.process_command(0x20, 0x22, [])
+        receive = self._send_raw(_CMD_MODEL_NAME)
         # print('model_name_req', receive)
         if len(receive) == 0:
             return -1
@@ -164,16 +382,14 @@ class MDS:
         if receive[5] != 0x22:
             return -3
         if len(receive) > 5:
-            for counter in range(6,len(receive)-1,1):
-                if receive[counter] != 0:
-                    name += chr(receive[counter])
-            return name
+            # the name sits between byte 6 and the terminator, padded with 0x00
+            return receive[6:-1].replace(b'\x00', b'').decode('latin-1')
         else:
             return -4
 
     def operation_play(self): # 6.4
         """Set operation mode : play"""
-        receive = self.process_command(0x02, 0x01, [])
+        receive = self._send_raw(_CMD_PLAY)
         # print('operation_play', receive)
         if len(receive) == 0:
             return -1
@@ -189,14 +405,12 @@ class MDS:
 
     def operation_stop(self): # 6.5 / 7.5
         """Set operation mode : stop"""
-        receive = self.process_command(0x02, 0x02, [])
+        receive = self._send_raw(_CMD_STOP)
         # print('operation_stop:', receive)
         # when the deck is already in stop, then there will be no response ???
         # needs to be further checked at some point.
-        if receive[0] == -2: # -2 means, no data received
+        if len(receive) == 0: # no data received
             return 0
-        if len(receive) == 0:
-            return -1
         if receive[0] != 0x6F:
             return -1
         if receive[-1] != 0xFF:
@@ -209,7 +423,7 @@ class MDS:
 
     def operation_rec(self): # 6.13
         """Set operation mode : rec"""
-        receive = self.process_command(0x02, 0x21, [])
+        receive = self._send_raw(_CMD_REC)
         # print('operation_rec', receive)
         if len(receive) == 0:
             return -1
@@ -225,7 +439,8 @@ class MDS:
 
     def operation_eject(self): # 6.15
         """Set operation mode : eject"""
-        receive = self.process_command(0x02, 0x40)
+        self._rec_remain = None
+        receive = self._send_raw(_CMD_EJECT)
         print('operation_eject', receive)
         if len(receive) == 0:
             return -1
@@ -241,150 +456,51 @@ class MDS:
 
     def status_req(self, debug = False): # 6.30 / 7.11
         """Ask the MDS for status information"""
-        return_dict = dict()
-        receive = self.process_command(0x20, 0x20, [])
+        receive = self._send_raw(_CMD_STATUS)
         if debug:
             print('status_req', receive)
         if len(receive) == 0:
-            return_dict['return'] = -1
-            return return_dict
+            return {'return' : -1}
         if receive[0] != 0x6F:
-            return_dict['return'] = -1
-            return return_dict
+            return {'return' : -1}
         if receive[-1] != 0xFF:
-            return_dict['return'] = -1
-            return return_dict
+            return {'return' : -1}
         if receive[4] != 0x20:
-            return_dict['return'] = -2
-            return return_dict
+            return {'return' : -2}
         if receive[5] != 0x20:
-            return_dict['return'] = -3
-            return return_dict
+            return {'return' : -3}
         if receive[9] != 0x01:
-            return_dict['return'] = -4
-            return return_dict
-        data1 = '{0:08b}'.format(receive[6])
-        data2 = '{0:08b}'.format(receive[7])
-        data3 = '{0:08b}'.format(receive[8])
-        #-----------------------------------
-        # print(data1, data2, data3)
-        #-----------------------------------
-        return_dict['return'] = 0
-        #-----------------------------------
-        # disc info
-        if data1[2:3] == '1':
-            return_dict['disc'] = 'no disc'
-            if debug:
-                print('\t', 'No disc')
-        else:
-            return_dict['disc'] = 'disc loaded'
-            if debug:
-                print('\t', 'Disc exist')
-        #-----------------------------------
-        # operation mode info
-        if data1[4:8] == '0000':
-            return_dict['mode'] = 'STOP'
-            if debug:
-                print('\t', 'STOP')
-        if data1[4:8] == '0001':
-            return_dict['mode'] = 'PLAY'
-            if debug:
-                print('\t', 'PLAY')
-        if data1[4:8] == '0010':
-            return_dict['mode'] = 'PAUSE'
-            if debug:
-                print('\t', 'PAUSE')
-        if data1[4:8] == '0011':
-            return_dict['mode'] = 'EJECT'
-            if debug:
-                print('\t', 'EJECT')
-        if data1[4:8] == '0100':
-            return_dict['mode'] = 'REC PLAY'
-            if debug:
-                print('\t', 'REC PLAY')
-        if data1[4:8] == '0101':
-            return_dict['mode'] = 'REC PAUSE'
-            if debug:
-                print('\t', 'REC PAUSE')
-        if data1[4:8] == '0110':
-            return_dict['mode'] = 'rehearsal'
-            if debug:
-                print('\t', 'rehearsal')
-        if data1[4:8] == '1111':
-            return_dict['mode'] = 'not available to play'
-            if debug:
-                print('\t', 'not available to play')
-        #-----------------------------------
-        # TOC info
-        if data2[0:1] == '1':
-            return_dict['TOC'] = 'read done'
-            if debug:
-                print('\t', 'TOC read done')
-        else:
-            return_dict['TOC'] = 'not yet read'
-            if debug:
-                print('\t', 'TOC read not yet')
-        #-----------------------------------
-        # REC info
-        if data2[2:3] == '1':
-            return_dict['REC'] = 'possible'
-            if debug:
-                print('\t', 'REC possible')
-        else:
-            return_dict['REC'] = 'impossible'
-            if debug:
-                print('\t', 'REC impossible')
-        #-----------------------------------
-        # Channels
-        if data3[0:1] == '1':
-            return_dict['channels'] = 'MONO'
-            if debug:
-                print('\t', 'MONO')
-        else:
-            return_dict['channels'] = 'STEREO'
-            if debug:
-                print('\t', 'STEREO')
-        #-----------------------------------
-        # copy info
-        if data3[1:2] == '1':
-            return_dict['COPY'] = 'impossible'
-            if debug:
-                print('\t', 'COPY impossible')
-        else:
-            return_dict['COPY'] = 'possible'
-            if debug:
-                print('\t', 'COPY possible')
-        #-----------------------------------
-        # DIN info
-        if data3[2:3] == '1':
-            return_dict['DIN'] = 'unlock'
-            if debug:
-                print('\t', 'DIN unlock')
-        else:
-            return_dict['DIN'] = 'lock'
-            if debug:
-                print('\t', 'DIN lock')
-        #-----------------------------------
-        # input info
-        if data3[5:8] == '001':
-            return_dict['input'] = 'analog'
-            if debug:
-                print('\t', 'Analog')
-        if data3[5:8] == '011':
-            return_dict['input'] = 'optical'
-            if debug:
-                print('\t', 'Optical')
-        if data3[5:8] == '101':
-            return_dict['input'] = 'coaxial'
-            if debug:
-                print('\t', 'Coaxial')
-        #-----------------------------------
+            return {'return' : -4}
+        b6, b7, b8 = receive[6], receive[7], receive[8]
+        return_dict = {
+            'return'    : 0,
+            'disc'      : 'no disc' if b6 & 0x20 else 'disc loaded',
+            'mode'      : self._MODE_MAP.get(b6 & 0x0F, 'unknown'),
+            'TOC'       : 'read done' if b7 & 0x80 else 'not yet read',
+            'REC'       : 'possible' if b7 & 0x20 else 'impossible',
+            'channels'  : 'MONO' if b8 & 0x80 else 'STEREO',
+            'COPY'      : 'impossible' if b8 & 0x40 else 'possible',
+            'DIN'       : 'unlock' if b8 & 0x20 else 'lock',
+            'input'     : self._INPUT_MAP.get(b8 & 0x07, 'unknown'),
+            }
+        if debug:
+            pprint.pprint(return_dict)
         return return_dict
 
+    def wait_until(self, mode, timeout = 5.0, interval = 0.05) -> bool:
+        """Poll the status of the MDS until it reports the given operation mode, for example 'REC PAUSE'.
+        Returns True as soon as the mode is reached and False when the timeout runs out."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.status_req().get('mode') == mode:
+                return True
+            time.sleep(interval)
+        return False
+
     def toc_data_req(self): # 6.34 / 7.21
         """Ask the MDS for toc data"""
         return_dict = dict()
-        receive = self.process_command(0x20, 0x44, [0x01])
+        receive = self._send_raw(_CMD_TOC_DATA)
         # print('toc_data_req', receive)
         if len(receive) == 0:
             return_dict['return'] = -1
@@ -419,7 +535,7 @@ class MDS:
     def disc_data_req(self): # 6.31 / 7.12
         """Ask the MDS for disc data"""
         return_dict = dict()
-        receive = self.process_command(0x20, 0x21, [])
+        receive = self._send_raw(_CMD_DISC_DATA)
         # print('disc_data_req', receive)
         if len(receive) == 0:
             return_dict['return'] = -1
@@ -476,7 +592,9 @@ class MDS:
 
     def disc_name_req(self) -> str: # 6.36 / 7.15
         """Ask the MDS for the disc name"""
-        receive = self.process_command(0x20, 0x48, [0x01], sleep=0.7)
+        receive = self._send_raw(_CMD_DISC_NAME)
+        if len(receive) > 5 and receive[5] == 0x48:
+            receive = self._read_name_packets(receive, 0x49)
         # print('disc_name_req', receive)
         if len(receive) == 0:
             return '-1'
@@ -490,26 +608,12 @@ class MDS:
             disc_name = 'no disk name set'
             return disc_name
         if receive[5] == 0x48:
-            disc_name = ''
-            header      = 0
-            terminator  = 0
-            while terminator < len(receive):
-                header      = receive.index(111,header)
-                terminator  = receive.index(255,terminator)
-                # get part of the message, then move to the next part
-                part = receive[header+7:terminator]
-                for item in part:
-                    if (item != 0x00) and (item != 0xFF):
-                        disc_name += chr(item)
-                # move the new header 
-                header      = terminator
-                terminator  += 1
-            return disc_name
+            return self._extract_name(receive, 0x48)
         return 0
 
     def rec_remain_req(self) -> int: # 6.40
         """Ask the MDS for rec remain time"""
-        receive = self.process_command(0x20, 0x54, [0x01])
+        receive = self._send_raw(_CMD_REC_REMAIN)
         # print('rec_remain_req', receive)
         if len(receive) == 0:
             return -1
@@ -527,9 +631,46 @@ class MDS:
         seconds = receive[8]
         return minutes*60 + seconds
 
+    def rec_remain_cached(self, track_length):
+        """Rec remain time in seconds for a track that is about to be recorded. The MDS is only asked
+        once per session and again when the local estimate drops below twice the track length.
+        Call rec_remain_used after the recording to keep the estimate up to date."""
+        if self._rec_remain is None or self._rec_remain < 2*track_length:
+            remain = self.rec_remain_req()
+            if remain < 0:          # error code, nothing to keep
+                return remain
+            self._rec_remain = remain
+        return self._rec_remain
+
+    def rec_remain_used(self, seconds):
+        """Take a finished recording off the local rec remain estimate."""
+        if self._rec_remain is not None:
+            self._rec_remain = max(0, self._rec_remain - seconds)
+
     def track_name_req(self, tracknr) -> str: # 6.37 / 7.16 / 7.26
         """Ask the MDS for a track name"""
-        receive = self.process_command(0x20, 0x4A, [tracknr], sleep=3)
+        receive = self._send_raw(self._frame(0x20, 0x4A, bytes((tracknr,))), reader=self._read_track_name)
+        return self._parse_track_name(receive)
+
+    def track_name_req_async(self, tracknr):
+        """Ask the MDS for a track name without waiting. Returns a Future that resolves to the track name."""
+        return self.process_command_async(0x20, 0x4A, bytes((tracknr,)), reader=self._read_track_name, parse=self._parse_track_name)
+
+    def _read_track_name(self):
+        """Read the reply packets of a track name request."""
+        # looking up a track name takes the MDS a while, so allow more time than usual
+        timeout = self.ser.timeout
+        self.ser.timeout = 4
+        try:
+            receive = self._read_packet()
+            if len(receive) > 5 and receive[5] == 0x4A:
+                receive = self._read_name_packets(receive, 0x4B)
+        finally:
+            self.ser.timeout = timeout
+        return receive
+
+    def _parse_track_name(self, receive) -> str:
+        """Get the track name out of the reply packets of a track name request."""
         # print('track_name_req', receive)
         if len(receive) == 0:
             return '-1'
@@ -542,51 +683,36 @@ class MDS:
         if receive[5] == 0x86: # -> no track name message
             return 'no track name set'
         if receive[5] == 0x4A:
-            track_name = ''
-            header      = 0
-            terminator  = 0
-            while terminator < len(receive):
-                header      = receive.index(111,header)
-                terminator  = receive.index(255,terminator)
-                # get part of the message, then move to the next part
-                part = receive[header+7:terminator]
-                for item in part:
-                    if (item != 0x00) and (item != 0xFF):
-                        track_name += chr(item)
-                    # as soon as we see the 0x00 it is the end of the name
-                    if item == 0x00:
-                        break
-                # move the new header 
-                header      = terminator
-                terminator  += 1
-            return track_name
+            return self._extract_name(receive, 0x4A)
         return 0
 
+    def encode_track_name(self, name) -> bytes:
+        """Turn a track name into the bytes that are sent to the MDS. Characters that can not be sent become '?'."""
+        return name.encode('latin-1', 'replace')
+
     def track_name_write(self, tracknr, name) -> int: # 6.43
-        """Ask the MDS to write a name to a track"""
-        # name part needs to end with 0x00 to indicate to the MDS
+        """Ask the MDS to write a name to a track. The name can also be given as bytes from encode_track_name."""
+        if isinstance(name, str):
+            name = self.encode_track_name(name)
+        # name needs to end with 0x00 to indicate to the MDS
         # that no further name data is to be expected
-        name += chr(0x00)
-        packet = 1
-        namecounter = 0
-        while namecounter < len(name):
-            namepart = name[namecounter:namecounter+16]
-            # print(namepart, len(namepart))
-            data = []
-            # only the first is sending track number
+        payload = name + b'\x00'
+        frames = []
+        for packet, namecounter in enumerate(range(0, len(payload), 16), 1):
+            namepart = payload[namecounter:namecounter+16]
+            # only the first is sending track number and uses a different command,
+            # after that we continue with packet numbers
             if packet == 1:
-                data.append(tracknr)
-            else: # after that we continue with packet numbers
-                data.append(packet)
-            # byte all the letters
-            for letter in namepart:
-                data.append( ord(letter) )
-            # different command if first or second
-            if packet == 1:
-                receive = self.process_command(0x20, 0x72, data)
+                prefix = self._PREFIX.pack(0x7E, len(namepart)+8, 0x05, 0x47, 0x20, 0x72) + bytes((tracknr,))
             else:
-                receive = self.process_command(0x20, 0x73, data)
-            # handle the responses
+                prefix = self._PREFIX.pack(0x7E, len(namepart)+8, 0x05, 0x47, 0x20, 0x73) + bytes((packet,))
+            frames.append(prefix + namepart + b'\xFF')
+        # send all packets in one go, then collect a response for each of them
+        replies = self._send_raw(b''.join(frames), reader=lambda: self._read_acks(len(frames)))
+        if replies is _WRITE_FAILED or len(replies) != len(frames):
+            return -1
+        # handle the responses
+        for receive in replies:
             # print('track_name_write', receive)
             if receive[0] != 0x6F:
                 return -1
@@ -596,7 +722,36 @@ class MDS:
                 return -2
             if receive[5] != 0x87:
                 return -2
-            # up the counters
-            packet += 1
-            namecounter += 16
-        return 0
\ No newline at end of file
+        return 0
+
+
+class DeckWorker(threading.Thread):
+    """Thread that owns the deck. Calls are queued with submit and run one after the other,
+    so the caller can prepare the next step while the deck is still busy with the previous one."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.q = queue.Queue()
+
+    def run(self):
+        """Run the queued calls until stop is called."""
+        while True:
+            fn, args, future = self.q.get()
+            if fn is None:
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except Exception as error:
+                future.set_exception(error)
+
+    def submit(self, fn, *args):
+        """Queue a call, for example submit(deck.toc_data_req). Returns a Future for the result."""
+        future = concurrent.futures.Future()
+        self.q.put((fn, args, future))
+        return future
+
+    def stop(self):
+        """Let the thread end after the calls that have been queued so far."""
+        self.q.put((None, (), None))
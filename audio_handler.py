@@ -12,62 +12,162 @@
 
 # for the file information
 import mutagen                      # for metadata
-from mutagen.id3 import ID3         # for metadata
-from mutagen.mp3 import MP3         # for metadata
-from mutagen.flac import FLAC       # for metadata
+from mutagen.mp3 import EasyMP3     # for metadata
 from unidecode import unidecode     # to change title or artist text to unicode
 
 import os                           # miniaudio only works with absolute paths
-import time                         # because the audio player is not blocking we need a timer
+import threading                    # to wait for the end of the audio stream
+import time                         # to let the device play out its buffer
 import miniaudio                    # for audio file playback
 
 
 
 class AudioHandler:
+    # mutagen parser per file extension, FLAC files are read directly
+    _PARSERS = {
+        '.mp3'  : EasyMP3,
+        }
+    # number of periods in the playback buffer, set explicitly so that we know how long it is
+    _PERIODS = 3
+
     def __init__(self):
         self.filename = ''
+        self._abs_cache = {}        # filename -> absolute path
+        self._meta_cache = {}       # filename -> (title, artist, length)
+
+    def _abspath(self, filename):
+        '''Get the absolute path of the file, miniaudio needs it. Only looked up once per file.'''
+        abs_file = self._abs_cache.get(filename)
+        if abs_file is None:
+            abs_file = os.path.join(os.getcwd(), filename )
+            self._abs_cache[filename] = abs_file
+        return abs_file
+
+    def _load_meta(self, filename):
+        '''Get title, artist and length of the song via mutagen. The file is only parsed once.'''
+        meta = self._meta_cache.get(filename)
+        if meta is None:
+            title = 'title'
+            artist = 'artist'
+            file_length = 0
+            extension = os.path.splitext(filename)[1].lower()
+            flac_meta = None
+            if extension == '.flac':
+                flac_meta = self._read_flac_meta(self._abspath(filename))
+            if flac_meta is not None:
+                title, artist, file_length = flac_meta
+            else:
+                # pick the parser on the extension, other formats are left to mutagen to detect
+                parser = self._PARSERS.get(extension)
+                if parser is not None:
+                    file_info = parser(self._abspath(filename))
+                else:
+                    file_info = mutagen.File(self._abspath(filename), easy=True)
+                if file_info is not None:
+                    if file_info.tags is not None:
+                        title = file_info.tags.get('title', [title])[0]
+                        artist = file_info.tags.get('artist', [artist])[0]
+                    file_length = file_info.info.length
+            meta = (unidecode(title), unidecode(artist), file_length)
+            self._meta_cache[filename] = meta
+        return meta
+
+    def _read_flac_meta(self, abs_file):
+        '''Read title, artist and length straight from the FLAC metadata blocks. Only the STREAMINFO
+        and VORBIS_COMMENT blocks are read, pictures and padding are skipped. Returns None when the
+        file does not start with the FLAC marker, for example when an ID3 tag comes first.'''
+        title = 'title'
+        artist = 'artist'
+        file_length = 0
+        with open(abs_file, 'rb') as file:
+            if file.read(4) != b'fLaC':
+                return None
+            file_size = os.fstat(file.fileno()).st_size
+            found = set()
+            last = False
+            while not last and len(found) < 2:
+                # every block starts with a last-block flag, the block type and the block size
+                header = file.read(4)
+                if len(header) < 4:
+                    break
+                last = header[0] >> 7
+                block_type = header[0] & 0x7F
+                size = int.from_bytes(header[1:4], 'big')
+                # a block that runs past the end of the file means the file is truncated or corrupt
+                if file.tell() + size > file_size:
+                    break
+                if block_type == 0:         # STREAMINFO
+                    info = file.read(size)
+                    if len(info) < 18:
+                        break
+                    # 20 bits sample rate, 3 bits channels, 5 bits sample size, 36 bits total samples
+                    bits = int.from_bytes(info[10:18], 'big')
+                    sample_rate = bits >> 44
+                    if sample_rate:
+                        file_length = (bits & 0xFFFFFFFFF) / sample_rate
+                    found.add(block_type)
+                elif block_type == 4:       # VORBIS_COMMENT
+                    comments = self._parse_vorbis_comment(file.read(size))
+                    title = comments.get('title', title)
+                    artist = comments.get('artist', artist)
+                    found.add(block_type)
+                else:                       # PICTURE, PADDING and the others are not needed
+                    file.seek(size, 1)
+        return title, artist, file_length
+
+    def _parse_vorbis_comment(self, data):
+        '''Get the fields of a vorbis comment block as a dict with lower case names.
+        Only the first value of a field is kept.'''
+        comments = {}
+        # all lengths in a vorbis comment are 32 bit little endian
+        vendor_length = int.from_bytes(data[0:4], 'little')
+        position = 4 + vendor_length
+        count = int.from_bytes(data[position:position+4], 'little')
+        position += 4
+        for _ in range(count):
+            # stop at a count or length that runs past the end of the block
+            if position + 4 > len(data):
+                break
+            length = int.from_bytes(data[position:position+4], 'little')
+            position += 4
+            if position + length > len(data):
+                break
+            field = data[position:position+length].decode('utf-8', 'replace')
+            position += length
+            name, _, value = field.partition('=')
+            comments.setdefault(name.lower(), value)
+        return comments
+
+    def get_tags(self, filename):
+        '''Get title, artist and length of the song in one go.'''
+        title, artist, file_length = self._load_meta(filename)
+        return {'title' : title, 'artist' : artist, 'length' : file_length}
 
-    def play_file(self,filename,sleeptime):
-        '''Will play a file and use a timer to make it blocking. Not blocking function, have to pause via timer...'''
-        abs_filename = os.path.join(os.getcwd(), filename ) 
-        stream = miniaudio.stream_file(abs_filename)
-        with miniaudio.PlaybackDevice() as device:
+    def play_file(self,filename,timeout=None):
+        '''Will play a file and block until the stream has been played completely. The optional timeout
+        in seconds is a watchdog only, playback is stopped when it runs out and -1 is returned.'''
+        finished = threading.Event()
+        stream = miniaudio.stream_file(self._abspath(filename))
+        # the end callback is called by miniaudio once the file stream is exhausted
+        stream = miniaudio.stream_with_callbacks(stream, end_callback=finished.set)
+        next(stream)                # the device expects a started generator
+        with miniaudio.PlaybackDevice(callback_periods=self._PERIODS) as device:
             device.start(stream)
-            time.sleep(sleeptime)
+            if not finished.wait(timeout):
+                return -1
+            # the stream is exhausted, but the device buffer can still hold all of its periods.
+            # closing the device now would cut off the end of the track
+            time.sleep(device.buffersize_msec * self._PERIODS / 1000)
         return 0
 
     def get_title(self, filename):
         '''Get the title of the song via mutagen.'''
-        abs_file = os.path.join(os.getcwd(), filename ) 
-        title = 'title'
-        if '.mp3' in filename.lower():
-            file_info = ID3(abs_file)
-            title = str(file_info.get('TIT2'))
-        if '.flac' in filename.lower():
-            file_info = mutagen.File(abs_file)
-            title = file_info.tags['title'][0]
-        return unidecode(title)
+        return self._load_meta(filename)[0]
 
     def get_artist(self, filename):
         '''Get the artist of the song via mutagen.'''
-        abs_file = os.path.join(os.getcwd(), filename ) 
-        artist = 'artist'
-        if '.mp3' in filename.lower():
-            file_info = ID3(abs_file)
-            artist = str(file_info.get('TPE1'))
-        if '.flac' in filename.lower():
-            file_info = mutagen.File(abs_file)
-            artist = file_info.tags['artist'][0]
-        return unidecode(artist)
+        return self._load_meta(filename)[1]
 
     def get_track_length(self, filename):
-        '''Get the length of the song via mutagen. This is needed as our player function is not blocking.'''
-        abs_file = os.path.join(os.getcwd(), filename ) 
-        file_length = 0
-        if '.mp3' in filename.lower():
-            file_info = MP3(abs_file)
-            file_length = file_info.info.length
-        if '.flac' in filename.lower():
-            file_info = FLAC(abs_file)    
-            file_length = file_info.info.length
-        return file_length
\ No newline at end of file
+        '''Get the length of the song via mutagen.'''
+        return self._load_meta(filename)[2]
@@ -52,8 +52,11 @@ toc_data = deck.toc_data_req()
 print('TOC data request', toc_data)
 
 # ask the name of all the tracks on the disc
-for counter in range(toc_data.get('first_track'), toc_data.get('last_track')+1,1):
-    print('Track name request', '\t\t'+str(counter), '\t' + str( deck.track_name_req(counter) ))
+# the requests are sent back to back, the replies are collected in the background
+tracknrs = range(toc_data.get('first_track'), toc_data.get('last_track')+1,1)
+track_names = [deck.track_name_req_async(counter) for counter in tracknrs]
+for counter, track_name in zip(tracknrs, track_names):
+    print('Track name request', '\t\t'+str(counter), '\t' + str( track_name.result() ))
 
 # ask the deck how many seconds are left for recording
 print('REC remain request [sec]', deck.rec_remain_req() )
@@ -1,6 +1,6 @@
 ###############################################################################
 #
-#   Demonstration script to record a track to the deck.
+#   Demonstration script to record one or more tracks to the deck.
 #
 ###############################################################################
 #
@@ -10,17 +10,37 @@
 ###############################################################################
 
 import sys                                      # so that we know on what system we run
-import time
+import asyncio                                  # to overlap file and deck handling
+import io                                       # to collect the output
 from SONY_MDS_E12 import MDS as mds             # import the class for the deck
+from SONY_MDS_E12 import DeckWorker             # thread that runs the deck commands
 from audio_handler import AudioHandler as ahc   # wrapper for mutagen
 ah = ahc()                                      # create instance of the class
 
-# name of file to record to disc
-filename = "SITHEA - Overthinking.flac"
+# names of the files to record to disc, in this order
+filenames = ["SITHEA - Overthinking.flac"]
 
-print('#'*80)
-print('Demo script to record a song to the MDS-E12')
-print('#'*80)
+# read the track name back from the disc after writing it, costs an extra request
+VERIFY = False
+
+# the output is collected and only written out when the deck is not waiting on us,
+# console writes between the deck commands slow the session down
+_log = io.StringIO()
+
+def log(*args):
+    '''Collect a line of output, like print.'''
+    print(*args, file=_log)
+
+def flush_log():
+    '''Write out the collected output.'''
+    sys.stdout.write(_log.getvalue())
+    sys.stdout.flush()
+    _log.seek(0)
+    _log.truncate()
+
+log('#'*80)
+log('Demo script to record a song to the MDS-E12')
+log('#'*80)
 
 # create instance of the deck and connect to a COM-port - Windows
 if sys.platform == 'win32':
@@ -32,62 +52,108 @@ if sys.platform == 'win32':
 # if sys.platform == 'linux':
 #     deck = mds('xxxxxxx')
 
-# try to open the serial port
-if not deck.serial_open():
-    print('Could not open serial port:', deck.serialport)
-
-# try to put the deck in remote mode
-if deck.remote_on() != 0:
-    print('Could not set MD deck in remote mode.')
-
-# ask the model name of the deck
-print('Connected with', deck.model_name_req() )
-
-# ask how many seconds are left on the disc for recording
-disc_remain_sec = deck.rec_remain_req()
-print('REC remain request [sec]', '\t', disc_remain_sec)
-
-# get some basic info from the song
-title = ah.get_title(filename)
-artist = ah.get_artist(filename)
-track_name = artist + ' - ' + title
-track_length = ah.get_track_length(filename)
-print('Name   of track', '\t\t', track_name)
-print('Length of track', '\t\t', track_length)
-
-# check if there is space. else warn the user
-if track_length > disc_remain_sec:
-    print('Not enough space on Mini-disc left!')
-
-# check what the next track number is going to be
-toc_data = deck.toc_data_req()
-print('Next tracknr', '\t\t\t', toc_data.get('last_track')+1)
-
-# prepare deck for recording
-print('Prepare for recording.')
-deck.operation_rec()
-time.sleep(5)
-deck.operation_play()
-print('Playback file from computer.')
-ah.play_file(filename, track_length)    # sleep in the method...
-print('Playback has ended.')
-# stop the deck. recording complete
-deck.operation_stop()
-# give the deck time to finish up
-time.sleep(2)
-
-toc_data = deck.toc_data_req()
-print('Track number', '\t\t\t', toc_data.get('last_track'))
-
-deck.track_name_write(toc_data.get('last_track'), track_name)
-print('Name on disc', '\t\t\t', deck.track_name_req(toc_data.get('last_track')) )
-
-# disable the remote mode of the deck so that the front panel can be used
-if not deck.remote_off() == 0:
-    print('Could not disable remote mote of the deck')
-
-# close the serial port
-if deck.serial_close():
-    print('Could not close serialport', deck.serialport)
-
-print('#'*80)
\ No newline at end of file
+
+def on_deck(worker, fn, *args):
+    '''Queue a deck command on the worker thread and get an awaitable for the result.'''
+    return asyncio.wrap_future(worker.submit(fn, *args))
+
+
+async def record_one(worker, deck, ah, filename, next_track):
+    '''Record a single file to the disc as track next_track. Returns the number for the track after it.'''
+    # get some basic info from the song
+    tags = ah.get_tags(filename)
+    track_name = tags['artist'] + ' - ' + tags['title']
+    track_length = tags['length']
+
+    # space left on the disc, the deck is only asked when our own estimate gets tight
+    disc_remain_sec = on_deck(worker, deck.rec_remain_cached, track_length)
+    # prepare the name for the deck now, so that after recording only the writing is left
+    encoded_name = deck.encode_track_name(track_name)
+    disc_remain_sec = await disc_remain_sec
+    log('REC remain request [sec]', '\t', disc_remain_sec)
+    log('Name   of track', '\t\t', track_name)
+    log('Length of track', '\t\t', track_length)
+
+    # check if there is space. else warn the user
+    if track_length > disc_remain_sec:
+        log('Not enough space on Mini-disc left!')
+
+    log('Next tracknr', '\t\t\t', next_track)
+
+    # prepare deck for recording, the wait is queued right behind the rec command
+    log('Prepare for recording.')
+    worker.submit(deck.operation_rec)
+    # wait for the deck to be ready for recording
+    await on_deck(worker, deck.wait_until, 'REC PAUSE')
+    await on_deck(worker, deck.operation_play)
+    log('Playback file from computer.')
+    # nothing is sent to the deck during playback, a good moment to show the output so far
+    flush_log()
+    # playback ends with the file, the track length is only used as a watchdog.
+    # a length of 0 means it could not be read from the file, then there is no watchdog
+    watchdog = track_length + 10 if track_length else None
+    if await asyncio.to_thread(ah.play_file, filename, watchdog) != 0:
+        log('Playback did not end in time, stopped.')
+    log('Playback has ended.')
+    # stop the deck. recording complete, so the track now takes up space on the disc
+    worker.submit(deck.operation_stop)
+    worker.submit(deck.rec_remain_used, track_length)
+    # give the deck time to finish up, then write the name
+    worker.submit(deck.wait_until, 'STOP', 2.5)
+    await on_deck(worker, deck.track_name_write, next_track, encoded_name)
+
+    log('Track number', '\t\t\t', next_track)
+    if VERIFY:
+        log('Name on disc', '\t\t\t', await on_deck(worker, deck.track_name_req, next_track) )
+    return next_track + 1
+
+
+async def record_many(worker, deck, ah, filenames):
+    '''Record all files to the disc in one session, the deck is only set up once.'''
+    # try to open the serial port
+    if not deck.serial_open():
+        log('Could not open serial port:', deck.serialport)
+    # small replies from the deck should not wait in the driver, if possible
+    deck.enable_low_latency()
+
+    # queue the setup of the deck, the commands run one after the other on the worker
+    worker.start()
+    remote_on = on_deck(worker, deck.remote_on)
+    model_name = on_deck(worker, deck.model_name_req)
+    toc_data = on_deck(worker, deck.toc_data_req)
+
+    # try to put the deck in remote mode
+    if await remote_on != 0:
+        log('Could not set MD deck in remote mode.')
+
+    # ask the model name of the deck
+    log('Connected with', await model_name )
+
+    # check what the next track number is going to be, after that we keep count ourselves
+    next_track = (await toc_data).get('last_track')+1
+
+    for filename in filenames:
+        log('-'*80)
+        next_track = await record_one(worker, deck, ah, filename, next_track)
+    log('-'*80)
+
+    # verify the track count once at the end of the session
+    toc_data = await on_deck(worker, deck.toc_data_req)
+    log('Tracks on disc', '\t\t\t', toc_data.get('last_track'))
+
+    # disable the remote mode of the deck so that the front panel can be used
+    if not await on_deck(worker, deck.remote_off) == 0:
+        log('Could not disable remote mote of the deck')
+
+    # close the serial port
+    if await on_deck(worker, deck.serial_close):
+        log('Could not close serialport', deck.serialport)
+    worker.stop()
+
+
+try:
+    asyncio.run(record_many(DeckWorker(), deck, ah, filenames))
+    log('#'*80)
+finally:
+    # also show what was collected when the session ended with an error
+    flush_log()